@@ -7,17 +7,139 @@ It includes functions to analyze sales growth, profit by region and product cate
 and create visualizations of the data.
 """
 
+import hashlib
+import inspect
+import os
+import tempfile
+import time
+import types
+from datetime import date
+from functools import wraps
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from sqlalchemy import text
+
+from column_types import convert_to_categorical
 
 def setup_visualization_style():
     """
-    Set up the visualization style for plots
+    Set up the visualization style and the figure shared by all plots
+    
+    Returns:
+        tuple: (matplotlib.figure.Figure, matplotlib.axes.Axes) to draw on
     """
     sns.set(style="whitegrid")
-    plt.figure(figsize=(12, 8))
+    return plt.subplots(figsize=(12, 8))
+
+def _prepare_axes(ax, figsize):
+    """
+    Return cleared axes resized to figsize, creating a new figure if ax is None
+    
+    Args:
+        ax (matplotlib.axes.Axes or None): Axes to reuse
+        figsize (tuple): Figure size in inches
+        
+    Returns:
+        matplotlib.axes.Axes: Axes ready for drawing
+    """
+    if ax is None:
+        return plt.subplots(figsize=figsize)[1]
+    ax.clear()
+    ax.set_aspect('auto')  # clear() keeps the equal aspect left by a pie chart
+    ax.figure.set_size_inches(figsize)
+    return ax
+
+# Analysis window (2012-2015), as a half-open date range so an index on
+# `Order Date` can be used for a range scan
+ANALYSIS_DATE_RANGE = {"start_date": date(2012, 1, 1), "end_date": date(2016, 1, 1)}
 
+YEARLY_STATE_SALES_SELECT = """
+    SELECT 
+        State,
+        YEAR(`Order Date`) AS Order_Year,
+        SUM(Sales) AS Total_Sales
+    FROM sales
+    WHERE `Order Date` >= :start_date AND `Order Date` < :end_date
+    GROUP BY State, Order_Year
+"""
+
+SQL_CACHE_DIR = '.cache'
+
+def sql_cache(*depends_on, ttl=None, cache_dir=SQL_CACHE_DIR):
+    """
+    Cache a query function's DataFrame on disk as Parquet
+    
+    The cache key hashes the function's bytecode and constants (and so its
+    SQL text), the module-level SQL fragments and bound parameters it depends
+    on, its bound non-connection arguments, the database it runs against and
+    the latest `Order Date` in the sales table. Editing a query or its
+    parameters, switching databases, or loading new sales data therefore
+    invalidates earlier results. The decorated function must take the
+    database connection as its first argument; the wrapper also gains an
+    ``is_cached(connection, ...)`` helper.
+    
+    Args:
+        *depends_on: Module-level SQL fragments or parameters used by the query
+        ttl (float, optional): Maximum cache age in seconds; no expiry if None
+        cache_dir (str): Directory holding the cached Parquet files
+        
+    Returns:
+        callable: Decorator for query functions
+    """
+    def decorator(func):
+        code = func.__code__
+        code_consts = tuple(c for c in code.co_consts if not isinstance(c, types.CodeType))
+        signature = inspect.signature(func)
+        
+        def cache_path_for(connection, *args, **kwargs):
+            bound = signature.bind(connection, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            max_order_date = connection.execute(
+                text("SELECT MAX(`Order Date`) FROM sales;")
+            ).scalar()
+            key_source = "|".join([
+                func.__qualname__, code.co_code.hex(), repr(code_consts),
+                repr(depends_on), repr(arguments),
+                connection.engine.url.render_as_string(hide_password=True),
+                str(max_order_date)
+            ])
+            key = hashlib.sha1(key_source.encode()).hexdigest()
+            return os.path.join(cache_dir, f"{key}.parquet")
+        
+        def is_fresh(cache_path):
+            return os.path.exists(cache_path) and (
+                ttl is None or time.time() - os.path.getmtime(cache_path) < ttl)
+        
+        @wraps(func)
+        def wrapper(connection, *args, **kwargs):
+            cache_path = cache_path_for(connection, *args, **kwargs)
+            if is_fresh(cache_path):
+                return pd.read_parquet(cache_path)
+            
+            df = func(connection, *args, **kwargs)
+            
+            # Write to a temporary file first so an interrupted run never
+            # leaves a truncated cache file behind
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.parquet.tmp')
+            os.close(fd)
+            try:
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return df
+        
+        wrapper.is_cached = lambda connection, *args, **kwargs: is_fresh(
+            cache_path_for(connection, *args, **kwargs))
+        return wrapper
+    return decorator
+
+@sql_cache()
 def analyze_yearly_sales(connection):
  
     query = """
@@ -29,30 +151,35 @@ def analyze_yearly_sales(connection):
     """
     return pd.read_sql_query(query, connection)
 
-def create_yearly_state_sales_view(connection):
+def create_yearly_state_sales_table(connection):
     """
-    Create a SQL view for yearly state sales
+    Create or refresh the materialized yearly state sales table
     
     Args:
         connection: Database connection object
     """
-    view_query = """
-    CREATE OR REPLACE VIEW yearly_state_sales AS
-    SELECT 
-        State,
-        YEAR(`Order Date`) AS Order_Year,
-        SUM(Sales) AS Total_Sales
-    FROM sales
-    WHERE YEAR(`Order Date`) BETWEEN 2012 AND 2015
-    GROUP BY State, Order_Year
-    ORDER BY State, Order_Year;
-    """
-    connection.execute(view_query)
+    connection.execute(text("""
+    CREATE TABLE IF NOT EXISTS yearly_state_sales_tbl (
+        State VARCHAR(64) NOT NULL,
+        Order_Year INT NOT NULL,
+        Total_Sales DOUBLE,
+        PRIMARY KEY (State, Order_Year)
+    );
+    """))
+    connection.execute(text("TRUNCATE TABLE yearly_state_sales_tbl;"))
+    connection.execute(text(
+        "INSERT INTO yearly_state_sales_tbl (State, Order_Year, Total_Sales)"
+        + YEARLY_STATE_SALES_SELECT
+    ), ANALYSIS_DATE_RANGE)
 
+@sql_cache(YEARLY_STATE_SALES_SELECT, ANALYSIS_DATE_RANGE)
 def calculate_sales_growth(connection):
     """
     Calculate sales growth rate by state and year
     
+    Reads yearly_state_sales_tbl, which must already be populated by
+    create_yearly_state_sales_table.
+    
     Args:
         connection: Database connection object
         
@@ -60,23 +187,21 @@ def calculate_sales_growth(connection):
         pandas.DataFrame: DataFrame with sales growth data
     """
     growth_query = """
-    WITH yearly_data AS (
-        SELECT * FROM yearly_state_sales
-    )
     SELECT 
         State,
         Order_Year,
         Total_Sales,
-        LAG(Total_Sales) OVER (PARTITION BY State ORDER BY Order_Year) AS Previous_Year_Sales,
+        LAG(Total_Sales) OVER w AS Previous_Year_Sales,
         ROUND(
-            (Total_Sales - LAG(Total_Sales) OVER (PARTITION BY State ORDER BY Order_Year)) / 
-            LAG(Total_Sales) OVER (PARTITION BY State ORDER BY Order_Year) * 100, 
+            (Total_Sales - LAG(Total_Sales) OVER w) / NULLIF(LAG(Total_Sales) OVER w, 0) * 100, 
         2) AS Growth_Rate_Pct
-    FROM yearly_data
+    FROM yearly_state_sales_tbl
+    WINDOW w AS (PARTITION BY State ORDER BY Order_Year)
     ORDER BY State, Order_Year;
     """
-    return pd.read_sql_query(growth_query, connection)
+    return convert_to_categorical(pd.read_sql_query(text(growth_query), connection))
 
+@sql_cache(ANALYSIS_DATE_RANGE)
 def analyze_profit_by_subcategory(connection):
     """
     Analyze profit by product sub-category and region
@@ -94,12 +219,53 @@ def analyze_profit_by_subcategory(connection):
         SUM(Profit) AS Total_Profit,
         COUNT(*) AS Order_Count
     FROM sales
-    WHERE YEAR(`Order Date`) BETWEEN 2012 AND 2015
+    WHERE `Order Date` >= :start_date AND `Order Date` < :end_date
     GROUP BY Region, `Product Sub-Category`
     ORDER BY Region, Total_Profit DESC;
     """
-    return pd.read_sql_query(profit_query, connection)
+    profit_df = pd.read_sql_query(text(profit_query), connection, params=ANALYSIS_DATE_RANGE)
+    return convert_to_categorical(profit_df)
+
+@sql_cache(ANALYSIS_DATE_RANGE)
+def analyze_top_n_profit_by_region(connection, n=5):
+    """
+    Analyze the top N most profitable product sub-categories in each region
+    
+    The per-region ranking is done in SQL so only the top N rows for
+    each region are returned.
+    
+    Args:
+        connection: Database connection object
+        n (int): Number of sub-categories to keep per region
+        
+    Returns:
+        pandas.DataFrame: DataFrame with top N sub-categories by region
+    """
+    top_n_query = """
+    WITH agg AS (
+        SELECT 
+            Region,
+            `Product Sub-Category` AS Sub_Category,
+            SUM(Profit) AS Total_Profit
+        FROM sales
+        WHERE `Order Date` >= :start_date AND `Order Date` < :end_date
+        GROUP BY 1, 2
+    ),
+    ranked AS (
+        SELECT 
+            *,
+            ROW_NUMBER() OVER (PARTITION BY Region ORDER BY Total_Profit DESC) AS rn
+        FROM agg
+    )
+    SELECT Region, Sub_Category, Total_Profit
+    FROM ranked
+    WHERE rn <= :n
+    ORDER BY Region, Total_Profit DESC;
+    """
+    top_n_df = pd.read_sql_query(text(top_n_query), connection, params={**ANALYSIS_DATE_RANGE, "n": n})
+    return convert_to_categorical(top_n_df)
 
+@sql_cache(ANALYSIS_DATE_RANGE)
 def find_top_products_by_region(connection):
     """
     Find top product sub-category in each region
@@ -118,7 +284,7 @@ def find_top_products_by_region(connection):
             SUM(Profit) AS Total_Profit,
             RANK() OVER (PARTITION BY Region ORDER BY SUM(Profit) DESC) AS rank_num
         FROM sales
-        WHERE YEAR(`Order Date`) BETWEEN 2012 AND 2015
+        WHERE `Order Date` >= :start_date AND `Order Date` < :end_date
         GROUP BY Region, `Product Sub-Category`
     )
     SELECT Region, Sub_Category, Total_Profit
@@ -126,41 +292,42 @@ def find_top_products_by_region(connection):
     WHERE rank_num = 1
     ORDER BY Total_Profit DESC;
     """
-    return pd.read_sql_query(top_products_query, connection)
+    top_products_df = pd.read_sql_query(text(top_products_query), connection, params=ANALYSIS_DATE_RANGE)
+    return convert_to_categorical(top_products_df)
 
-def visualize_top_subcategories(profit_df):
+def visualize_top_subcategories(top_subcats, n=5, ax=None):
     """
     Visualize top sub-categories by profit for each region
     
     Args:
-        profit_df (pandas.DataFrame): DataFrame with profit by sub-category and region
+        top_subcats (pandas.DataFrame): DataFrame with the top N sub-categories
+            per region, as returned by analyze_top_n_profit_by_region
+        n (int): Number of sub-categories per region, used in the title
+        ax (matplotlib.axes.Axes, optional): Axes to reuse; a new figure if None
         
     Returns:
         matplotlib.figure.Figure: Figure with visualization
     """
-    # Get top 5 sub-categories by profit for each region
-    top_subcats = profit_df.groupby('Region').apply(
-        lambda x: x.nlargest(5, 'Total_Profit')
-    ).reset_index(drop=True)
-    
     # Create plot
-    plt.figure(figsize=(15, 10))
-    g = sns.barplot(x='Sub_Category', y='Total_Profit', hue='Region', data=top_subcats)
-    plt.title('Top 5 Most Profitable Sub-Categories by Region (2012-2015)', fontsize=16)
-    plt.xlabel('Product Sub-Category', fontsize=14)
-    plt.ylabel('Total Profit ($)', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Region')
-    plt.tight_layout()
+    ax = _prepare_axes(ax, (15, 10))
+    sns.barplot(x='Sub_Category', y='Total_Profit', hue='Region', data=top_subcats, ax=ax)
+    ax.set_title(f'Top {n} Most Profitable Sub-Categories by Region (2012-2015)', fontsize=16)
+    ax.set_xlabel('Product Sub-Category', fontsize=14)
+    ax.set_ylabel('Total Profit ($)', fontsize=14)
+    ax.tick_params(axis='x', labelrotation=45)
+    plt.setp(ax.get_xticklabels(), ha='right')
+    ax.legend(title='Region')
+    ax.figure.tight_layout()
     
-    return plt.gcf()
+    return ax.figure
 
-def visualize_sales_growth(sales_growth_df):
+def visualize_sales_growth(sales_growth_df, ax=None):
     """
     Visualize sales growth for selected states
     
     Args:
         sales_growth_df (pandas.DataFrame): DataFrame with sales growth data
+        ax (matplotlib.axes.Axes, optional): Axes to reuse; a new figure if None
         
     Returns:
         matplotlib.figure.Figure: Figure with visualization
@@ -170,67 +337,73 @@ def visualize_sales_growth(sales_growth_df):
     filtered_df = sales_growth_df[sales_growth_df['State'].isin(selected_states)]
     
     # Create plot
-    plt.figure(figsize=(14, 8))
-    for state in selected_states:
-        state_data = filtered_df[filtered_df['State'] == state]
-        plt.plot(state_data['Order_Year'], state_data['Total_Sales'], marker='o', linewidth=2, label=state)
+    ax = _prepare_axes(ax, (14, 8))
+    sns.lineplot(data=filtered_df, x='Order_Year', y='Total_Sales', hue='State',
+                 hue_order=selected_states, marker='o', linewidth=2, ax=ax)
     
-    plt.title('Yearly Sales Trend for Selected States (2012-2015)', fontsize=16)
-    plt.xlabel('Year', fontsize=14)
-    plt.ylabel('Total Sales ($)', fontsize=14)
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.legend(title='State')
-    plt.tight_layout()
+    ax.set_title('Yearly Sales Trend for Selected States (2012-2015)', fontsize=16)
+    ax.set_xlabel('Year', fontsize=14)
+    ax.set_ylabel('Total Sales ($)', fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='State')
+    ax.figure.tight_layout()
     
-    return plt.gcf()
+    return ax.figure
 
 def main():
     """
     Main function to execute the data analysis process
     """
-    from database_operations import create_database_connection, connect_to_database
+    from database_operations import create_database_connection
     
     # Create database connection
     # Note: Replace with your actual credentials
     engine = create_database_connection('root', 'database123', 'localhost', 'walmart')
-    connection = connect_to_database(engine)
     
     # Set up visualization style
-    setup_visualization_style()
-    
-    # Analyze yearly sales
-    yearly_sales = analyze_yearly_sales(connection)
-    print("Yearly Sales Analysis:")
-    print(yearly_sales)
-    
-    # Create view for yearly state sales
-    create_yearly_state_sales_view(connection)
-    
-    # Calculate sales growth
-    sales_growth_df = calculate_sales_growth(connection)
-    print("\nSales Growth Analysis:")
-    print(sales_growth_df.head())
+    fig, ax = setup_visualization_style()
     
-    # Analyze profit by sub-category and region
-    profit_df = analyze_profit_by_subcategory(connection)
-    print("\nProfit by Sub-Category and Region:")
-    print(profit_df.head())
+    # Refresh the materialized yearly state sales table in its own transaction,
+    # since its DDL implicitly commits; skip it when the growth result is cached
+    with engine.begin() as connection:
+        if not calculate_sales_growth.is_cached(connection):
+            create_yearly_state_sales_table(connection)
     
-    # Find top products by region
-    top_products_df = find_top_products_by_region(connection)
-    print("\nTop Products by Region:")
-    print(top_products_df)
+    # Borrow a pooled connection; it is returned to the pool on exit
+    with engine.begin() as connection:
+        # Analyze yearly sales
+        yearly_sales = analyze_yearly_sales(connection)
+        print("Yearly Sales Analysis:")
+        print(yearly_sales)
+        
+        # Calculate sales growth
+        sales_growth_df = calculate_sales_growth(connection)
+        print("\nSales Growth Analysis:")
+        print(sales_growth_df.head())
+        
+        # Analyze profit by sub-category and region
+        profit_df = analyze_profit_by_subcategory(connection)
+        print("\nProfit by Sub-Category and Region:")
+        print(profit_df.head())
+        
+        # Get top 5 sub-categories by profit for each region
+        top_subcats_df = analyze_top_n_profit_by_region(connection, n=5)
+        
+        # Find top products by region
+        top_products_df = find_top_products_by_region(connection)
+        print("\nTop Products by Region:")
+        print(top_products_df)
     
     # Visualize top sub-categories
-    visualize_top_subcategories(profit_df)
-    plt.savefig('top_subcategories.png')
+    visualize_top_subcategories(top_subcats_df, n=5, ax=ax)
+    fig.savefig('top_subcategories.png')
     
     # Visualize sales growth
-    visualize_sales_growth(sales_growth_df)
-    plt.savefig('sales_growth.png')
+    visualize_sales_growth(sales_growth_df, ax=ax)
+    fig.savefig('sales_growth.png')
     
-    # Close connection
-    connection.close()
+    # Release the shared figure and its renderer
+    plt.close(fig)
     
     print("Data analysis completed successfully!")
 
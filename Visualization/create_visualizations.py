@@ -7,124 +7,192 @@ It generates various charts and graphs to visualize sales trends, profitability,
 and other key metrics from the Walmart retail sales data.
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib as mpl
+mpl.use("Agg")  # Render off-screen so worker processes never touch a GUI backend
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-import os
-
-# Create visualizations directory if it doesn't exist
-os.makedirs('visualizations', exist_ok=True)
 
 # Set visualization style
 sns.set(style="whitegrid")
 plt.rcParams['figure.figsize'] = (12, 8)
 plt.rcParams['font.size'] = 12
+plt.rcParams['agg.path.chunksize'] = 10000
+plt.rcParams['path.simplify_threshold'] = 1.0
 
-# Sample data creation (in a real scenario, this would be loaded from the database)
-# Creating yearly sales data
-years = list(range(2001, 2016))
-order_line_items = [322, 299, 277, 289, 310, 271, 247, 276, 288, 306, 245, 1580, 1325, 1144, 1220]
-yearly_sales_df = pd.DataFrame({'Year': years, 'Order_Line_Items': order_line_items})
-
-# Creating sales growth data for selected states
-states = ['California', 'New York', 'Texas', 'Florida', 'Illinois']
-years_growth = [2012, 2013, 2014, 2015]
-sales_data = {
-    'California': [250000, 275000, 310000, 290000],
-    'New York': [180000, 195000, 210000, 230000],
-    'Texas': [220000, 240000, 235000, 260000],
-    'Florida': [160000, 175000, 190000, 205000],
-    'Illinois': [140000, 130000, 150000, 165000]
-}
+def build_sample_data():
+    """
+    Build the sample datasets used by the charts
+    
+    In a real scenario this data would be loaded from the database.
+    
+    Returns:
+        tuple: (yearly_sales_df, sales_growth_df, profit_df) DataFrames
+    """
+    # Creating yearly sales data
+    years = list(range(2001, 2016))
+    order_line_items = [322, 299, 277, 289, 310, 271, 247, 276, 288, 306, 245, 1580, 1325, 1144, 1220]
+    yearly_sales_df = pd.DataFrame({'Year': years, 'Order_Line_Items': order_line_items})
+    
+    # Creating sales growth data for selected states
+    years_growth = [2012, 2013, 2014, 2015]
+    sales_data = {
+        'California': [250000, 275000, 310000, 290000],
+        'New York': [180000, 195000, 210000, 230000],
+        'Texas': [220000, 240000, 235000, 260000],
+        'Florida': [160000, 175000, 190000, 205000],
+        'Illinois': [140000, 130000, 150000, 165000]
+    }
+    sales_growth_df = pd.DataFrame(sales_data, index=years_growth)
+    
+    # Creating profit by region and subcategory data
+    regions = ['East', 'West', 'Central', 'South']
+    subcategories = [
+        'Office Machines', 'Telephones and Communication', 
+        'Binders and Binder Accessories', 'Copiers and Fax',
+        'Chairs & Chairmats', 'Computer Peripherals'
+    ]
+    
+    # Generate random profit data for each region and subcategory
+    rng = np.random.default_rng(42)  # For reproducibility
+    profits = rng.integers(5000, 90000, size=(len(regions), len(subcategories)))
+    order_counts = rng.integers(20, 200, size=profits.shape)
+    profit_df = pd.DataFrame({
+        'Region': np.repeat(regions, len(subcategories)),
+        'Sub_Category': np.tile(subcategories, len(regions)),
+        'Total_Profit': profits.ravel(),
+        'Order_Count': order_counts.ravel()
+    }).astype({
+        'Region': pd.CategoricalDtype(regions),
+        'Sub_Category': pd.CategoricalDtype(subcategories)
+    })
+    
+    return yearly_sales_df, sales_growth_df, profit_df
 
-# Creating profit by region and subcategory data
-regions = ['East', 'West', 'Central', 'South']
-subcategories = [
-    'Office Machines', 'Telephones and Communication', 
-    'Binders and Binder Accessories', 'Copiers and Fax',
-    'Chairs & Chairmats', 'Computer Peripherals'
-]
+def _save(fig, base, vector=False):
+    """
+    Save a figure as SVG (vector) or lossless WebP and return the output path
+    
+    Args:
+        fig (matplotlib.figure.Figure): Figure to save
+        base (str): Output path without extension
+        vector (bool): Write SVG instead of WebP
+        
+    Returns:
+        str: Path of the saved file
+    """
+    if vector:
+        output_path = f"{base}.svg"
+        fig.savefig(output_path, bbox_inches='tight')
+    else:
+        output_path = f"{base}.webp"
+        fig.savefig(output_path, dpi=300, bbox_inches='tight',
+                    pil_kwargs={"lossless": True, "quality": 80, "method": 4})
+    return output_path
 
-# Generate random profit data for each region and subcategory
-np.random.seed(42)  # For reproducibility
-profit_data = []
-for region in regions:
-    for subcategory in subcategories:
-        profit = np.random.randint(5000, 90000)
-        order_count = np.random.randint(20, 200)
-        profit_data.append({
-            'Region': region,
-            'Sub_Category': subcategory,
-            'Total_Profit': profit,
-            'Order_Count': order_count
-        })
-profit_df = pd.DataFrame(profit_data)
+def _prepare_axes(ax, figsize):
+    """
+    Return cleared axes resized to figsize, creating a new figure if ax is None
+    
+    Args:
+        ax (matplotlib.axes.Axes or None): Axes to reuse
+        figsize (tuple): Figure size in inches
+        
+    Returns:
+        matplotlib.axes.Axes: Axes ready for drawing
+    """
+    if ax is None:
+        return plt.subplots(figsize=figsize)[1]
+    ax.clear()
+    ax.set_aspect('auto')  # clear() keeps the equal aspect left by a pie chart
+    ax.figure.set_size_inches(figsize)
+    return ax
 
 # Visualization 1: Yearly Sales Trend
-def create_yearly_sales_chart():
-    plt.figure(figsize=(14, 8))
-    ax = sns.barplot(x='Year', y='Order_Line_Items', data=yearly_sales_df, palette='viridis')
+def create_yearly_sales_chart(yearly_sales_df, ax=None):
+    owns_figure = ax is None
+    ax = _prepare_axes(ax, (14, 8))
+    sns.barplot(x='Year', y='Order_Line_Items', hue='Year', data=yearly_sales_df,
+                palette='viridis', legend=False, ax=ax)
     
-    # Add value labels on top of bars
-    for i, v in enumerate(yearly_sales_df['Order_Line_Items']):
-        ax.text(i, v + 30, str(v), ha='center', fontweight='bold')
+    # Add value labels on top of bars; seaborn may split the bars across containers
+    for container in ax.containers:
+        ax.bar_label(container, padding=3, fontweight='bold')
     
-    plt.title('Yearly Sales Trend (2001-2015)', fontsize=18)
-    plt.xlabel('Year', fontsize=14)
-    plt.ylabel('Number of Order Line Items', fontsize=14)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.set_title('Yearly Sales Trend (2001-2015)', fontsize=18)
+    ax.set_xlabel('Year', fontsize=14)
+    ax.set_ylabel('Number of Order Line Items', fontsize=14)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.figure.tight_layout()
     
     # Save the figure
-    plt.savefig('visualizations/yearly_sales_trend.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    output_path = _save(ax.figure, 'visualizations/yearly_sales_trend')
+    if owns_figure:
+        plt.close(ax.figure)
     print("Created yearly sales trend visualization")
+    return output_path
 
 # Visualization 2: Sales Growth for Selected States
-def create_sales_growth_chart():
-    plt.figure(figsize=(14, 8))
+def create_sales_growth_chart(sales_growth_df, ax=None):
+    owns_figure = ax is None
+    ax = _prepare_axes(ax, (14, 8))
     
-    for state in states:
-        plt.plot(years_growth, sales_data[state], marker='o', linewidth=2, label=state)
+    for state in sales_growth_df.columns:
+        ax.plot(sales_growth_df.index, sales_growth_df[state].to_numpy(), marker='o', linewidth=2, label=state)
     
-    plt.title('Yearly Sales Trend for Selected States (2012-2015)', fontsize=18)
-    plt.xlabel('Year', fontsize=14)
-    plt.ylabel('Total Sales ($)', fontsize=14)
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.legend(title='State', fontsize=12)
-    plt.tight_layout()
+    ax.set_title('Yearly Sales Trend for Selected States (2012-2015)', fontsize=18)
+    ax.set_xlabel('Year', fontsize=14)
+    ax.set_ylabel('Total Sales ($)', fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='State', fontsize=12)
+    ax.figure.tight_layout()
     
     # Save the figure
-    plt.savefig('visualizations/state_sales_growth.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    output_path = _save(ax.figure, 'visualizations/state_sales_growth')
+    if owns_figure:
+        plt.close(ax.figure)
     print("Created state sales growth visualization")
+    return output_path
 
 # Visualization 3: Top Profitable Subcategories by Region
-def create_top_subcategories_chart():
+def create_top_subcategories_chart(profit_df, ax=None):
+    owns_figure = ax is None
     # Get top 3 subcategories by profit for each region
-    top_subcats = profit_df.groupby('Region').apply(
-        lambda x: x.nlargest(3, 'Total_Profit')
-    ).reset_index(drop=True)
+    top_subcats = (
+        profit_df.sort_values(['Region', 'Total_Profit'], ascending=[True, False])
+        .groupby('Region', sort=False, observed=True)
+        .head(3)
+        .reset_index(drop=True)
+    )
+    top_subcats['Sub_Category'] = top_subcats['Sub_Category'].cat.remove_unused_categories()
     
-    plt.figure(figsize=(16, 10))
-    g = sns.barplot(x='Sub_Category', y='Total_Profit', hue='Region', data=top_subcats, palette='Set2')
+    ax = _prepare_axes(ax, (16, 10))
+    sns.barplot(x='Sub_Category', y='Total_Profit', hue='Region', data=top_subcats, palette='Set2', ax=ax)
     
-    plt.title('Top 3 Most Profitable Sub-Categories by Region', fontsize=18)
-    plt.xlabel('Product Sub-Category', fontsize=14)
-    plt.ylabel('Total Profit ($)', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Region', fontsize=12)
-    plt.tight_layout()
+    ax.set_title('Top 3 Most Profitable Sub-Categories by Region', fontsize=18)
+    ax.set_xlabel('Product Sub-Category', fontsize=14)
+    ax.set_ylabel('Total Profit ($)', fontsize=14)
+    ax.tick_params(axis='x', labelrotation=45)
+    plt.setp(ax.get_xticklabels(), ha='right')
+    ax.legend(title='Region', fontsize=12)
+    ax.figure.tight_layout()
     
     # Save the figure
-    plt.savefig('visualizations/top_subcategories_by_region.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    output_path = _save(ax.figure, 'visualizations/top_subcategories_by_region')
+    if owns_figure:
+        plt.close(ax.figure)
     print("Created top subcategories by region visualization")
+    return output_path
 
 # Visualization 4: Profit vs Order Count Scatter Plot
-def create_profit_vs_orders_chart():
-    plt.figure(figsize=(14, 8))
+def create_profit_vs_orders_chart(profit_df, ax=None):
+    owns_figure = ax is None
+    ax = _prepare_axes(ax, (14, 8))
     
     sns.scatterplot(
         x='Order_Count', 
@@ -134,30 +202,34 @@ def create_profit_vs_orders_chart():
         sizes=(100, 1000),
         alpha=0.7,
         data=profit_df,
-        palette='deep'
+        palette='deep',
+        ax=ax
     )
     
-    plt.title('Profit vs Order Count by Region', fontsize=18)
-    plt.xlabel('Number of Orders', fontsize=14)
-    plt.ylabel('Total Profit ($)', fontsize=14)
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.legend(title='Region', fontsize=12)
-    plt.tight_layout()
+    ax.set_title('Profit vs Order Count by Region', fontsize=18)
+    ax.set_xlabel('Number of Orders', fontsize=14)
+    ax.set_ylabel('Total Profit ($)', fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='Region', fontsize=12)
+    ax.figure.tight_layout()
     
     # Save the figure
-    plt.savefig('visualizations/profit_vs_orders.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    output_path = _save(ax.figure, 'visualizations/profit_vs_orders')
+    if owns_figure:
+        plt.close(ax.figure)
     print("Created profit vs orders visualization")
+    return output_path
 
 # Visualization 5: Regional Profit Distribution
-def create_regional_profit_distribution():
+def create_regional_profit_distribution(profit_df, ax=None):
+    owns_figure = ax is None
     # Calculate total profit by region
-    region_profit = profit_df.groupby('Region')['Total_Profit'].sum().reset_index()
+    region_profit = profit_df.groupby('Region', observed=True)['Total_Profit'].sum().reset_index()
     
-    plt.figure(figsize=(12, 8))
+    ax = _prepare_axes(ax, (12, 8))
     
     # Create pie chart
-    plt.pie(
+    ax.pie(
         region_profit['Total_Profit'], 
         labels=region_profit['Region'],
         autopct='%1.1f%%',
@@ -168,23 +240,39 @@ def create_regional_profit_distribution():
         wedgeprops={'edgecolor': 'black', 'linewidth': 1}
     )
     
-    plt.title('Profit Distribution by Region', fontsize=18)
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-    plt.tight_layout()
+    ax.set_title('Profit Distribution by Region', fontsize=18)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+    ax.figure.tight_layout()
     
     # Save the figure
-    plt.savefig('visualizations/regional_profit_distribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    output_path = _save(ax.figure, 'visualizations/regional_profit_distribution', vector=True)
+    if owns_figure:
+        plt.close(ax.figure)
     print("Created regional profit distribution visualization")
+    return output_path
+
+def _render(task):
+    """Run one chart function with its arguments inside a worker process."""
+    chart_fn, args = task
+    return chart_fn(*args)
 
 if __name__ == "__main__":
     print("Generating visualizations for Walmart Retail Sales Analysis...")
     
-    # Create all visualizations
-    create_yearly_sales_chart()
-    create_sales_growth_chart()
-    create_top_subcategories_chart()
-    create_profit_vs_orders_chart()
-    create_regional_profit_distribution()
+    # Create visualizations directory if it doesn't exist
+    os.makedirs('visualizations', exist_ok=True)
+    
+    yearly_sales_df, sales_growth_df, profit_df = build_sample_data()
+    
+    # Create all visualizations, rendering and encoding them in parallel
+    tasks = [
+        (create_yearly_sales_chart, (yearly_sales_df,)),
+        (create_sales_growth_chart, (sales_growth_df,)),
+        (create_top_subcategories_chart, (profit_df,)),
+        (create_profit_vs_orders_chart, (profit_df,)),
+        (create_regional_profit_distribution, (profit_df,)),
+    ]
+    with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as executor:
+        list(executor.map(_render, tasks))
     
     print("All visualizations created successfully!")
@@ -0,0 +1,23 @@
+"""
+Walmart Retail Sales Column Types Module
+
+This module holds dtype helpers shared by the cleaning and analysis modules.
+"""
+
+CATEGORICAL_COLUMNS = ('Region', 'Sub_Category', 'State', 'Product Sub-Category')
+
+def convert_to_categorical(df, columns=CATEGORICAL_COLUMNS):
+    """
+    Convert low-cardinality string columns to pandas Categorical
+    
+    Args:
+        df (pandas.DataFrame): DataFrame to convert
+        columns (tuple): Column names to convert when present
+        
+    Returns:
+        pandas.DataFrame: DataFrame with categorical columns
+    """
+    for column in columns:
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df
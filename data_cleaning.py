@@ -6,30 +6,96 @@ This module handles the data cleaning operations for the Walmart Retail Sales da
 It includes functions to clean product names, format dates, and export the cleaned data to CSV.
 """
 
+import os
 import pandas as pd
-import csv
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
-def load_data(file_path):
-    return pd.read_excel(file_path)
+from column_types import convert_to_categorical
+
+def normalize_mixed_columns(df):
+    """
+    Convert object columns holding mixed value types to strings
+    
+    Excel columns can mix cell types (e.g. Ship Date holds both datetime and
+    text cells), which pyarrow cannot convert. Missing values are kept.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame to normalize
+        
+    Returns:
+        pandas.DataFrame: DataFrame with uniformly typed object columns
+    """
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        if values.dropna().map(type).nunique() > 1:
+            df[column] = values.where(values.isna(), values.astype(str))
+    return df
+
+def load_data(file_path, columns=None):
+    """
+    Load the raw Excel dataset, using a Parquet cache when it is up to date
+    
+    The first load parses the Excel file and writes a sibling .parquet file;
+    later loads read the cache instead, unless the Excel file is newer.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        columns (list, optional): Columns to load; all columns by default
+        
+    Returns:
+        pandas.DataFrame: Loaded dataset
+    """
+    cache_path = os.path.splitext(file_path)[0] + ".parquet"
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(file_path)):
+        return pd.read_parquet(cache_path, engine="pyarrow", columns=columns)
+    
+    df = normalize_mixed_columns(pd.read_excel(file_path))
+    df.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
+    if columns is not None:
+        df = df[columns]
+    return df
 
 def clean_product_names(df):
-    df["Product Name"] = df["Product Name"].str.encode('ascii', errors='ignore').str.decode('ascii')
+    # Strip non-ASCII characters in a single regex pass over an Arrow-backed column
+    df["Product Name"] = (
+        df["Product Name"]
+        .astype("string[pyarrow]")
+        .str.replace(r"[^\x00-\x7f]+", "", regex=True)
+    )
     return df
 
 def format_dates(df):
-    df['Order Date'] = pd.to_datetime(df['Order Date'])
+    # Excel usually yields datetimes already; only parse when we got strings
+    if not pd.api.types.is_datetime64_any_dtype(df['Order Date']):
+        df['Order Date'] = pd.to_datetime(df['Order Date'], format='%Y-%m-%d', cache=True)
     return df
 
 def export_to_csv(df, output_file):
     """
     Export cleaned data to CSV with pipe delimiter
     
+    Uses pyarrow's C++ CSV writer. An output path ending in .zst is written
+    zstd-compressed.
+    
     Args:
         df (pandas.DataFrame): DataFrame to export
         output_file (str): Output file path
     """
-    df.to_csv(output_file, sep="|", quoting=csv.QUOTE_ALL, 
-              doublequote=False, escapechar="\\", index=False)
+    table = pa.Table.from_pandas(normalize_mixed_columns(df), preserve_index=False)
+    
+    # Write Order Date as a plain date, matching the DATE column in MySQL
+    index = table.schema.get_field_index('Order Date')
+    if index != -1 and pa.types.is_timestamp(table.schema.field(index).type):
+        table = table.set_column(index, 'Order Date', table.column(index).cast(pa.date32()))
+    
+    write_options = pacsv.WriteOptions(delimiter="|", quoting_style="all_valid")
+    if output_file.endswith(".zst"):
+        with pa.CompressedOutputStream(output_file, "zstd") as sink:
+            pacsv.write_csv(table, sink, write_options=write_options)
+    else:
+        pacsv.write_csv(table, output_file, write_options=write_options)
 
 def main():
     """
@@ -44,6 +110,9 @@ def main():
     # Format dates
     sales = format_dates(sales)
     
+    # Dictionary-encode the grouping columns
+    sales = convert_to_categorical(sales)
+    
     # Export cleaned data
     export_to_csv(sales, "WalmartRetailSales_Cleaned.csv")
     
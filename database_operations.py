@@ -6,13 +6,26 @@ This module handles database operations for the Walmart Retail Sales dataset.
 It includes functions to connect to MySQL, create tables, and execute SQL queries.
 """
 
+import re
+from functools import lru_cache
+
 import pandas as pd
 import pymysql
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
 
+@lru_cache(maxsize=None)
 def create_database_connection(user, password, host, database):
     """
-    Create a connection to MySQL database
+    Create a pooled connection engine to MySQL database
+    
+    The engine is cached per set of credentials, so every caller in the
+    process shares the same connection pool and reuses warm connections.
     
     Args:
         user (str): MySQL username
@@ -24,7 +37,14 @@ def create_database_connection(user, password, host, database):
         sqlalchemy.engine.Engine: Database engine
     """
     connection_string = f'mysql+pymysql://{user}:{password}@{host}/{database}'
-    engine = create_engine(connection_string)
+    engine = create_engine(
+        connection_string,
+        pool_size=25,
+        max_overflow=25,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        future=True
+    )
     return engine
 
 def connect_to_database(engine):
@@ -52,18 +72,45 @@ def execute_query(connection, query):
     """
     return connection.execute(text(query))
 
-def read_sql_to_dataframe(query, connection):
+def read_sql_to_dataframe(query, connection, columns=None, chunksize=100_000):
     """
     Execute SQL query and return results as DataFrame
     
+    When given an Engine and connectorx is installed, the query runs through
+    connectorx, which fetches straight into Arrow buffers over its own
+    unpooled connection. A Connection is always read through pandas instead,
+    so the query sees the caller's uncommitted work and uses the pool: the
+    result is streamed through a server-side cursor and read in chunks with
+    pyarrow-backed dtypes.
+    
     Args:
         query (str): SQL query to execute
         connection (sqlalchemy.engine.Connection or sqlalchemy.engine.Engine): Database connection
+        columns (list, optional): Columns to project in place of a leading SELECT *
+            (applies on both paths)
+        chunksize (int): Number of rows per chunk on the pandas path; connectorx
+            ignores it
         
     Returns:
         pandas.DataFrame: Query results as DataFrame
     """
-    return pd.read_sql_query(query, connection)
+    if columns is not None:
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        query = re.sub(r"^\s*SELECT\s+\*", f"SELECT {column_list}", query,
+                       count=1, flags=re.IGNORECASE)
+    
+    if cx is not None and isinstance(connection, Engine):
+        # connectorx opens its own connection from a plain mysql:// URI
+        url = connection.url.set(drivername='mysql')
+        return cx.read_sql(url.render_as_string(hide_password=False), query,
+                           return_type="pandas")
+    
+    # Stream rows through a server-side cursor so only one chunk is buffered
+    # client-side at a time while pandas parses the previous one
+    statement = text(query).execution_options(stream_results=True, yield_per=chunksize)
+    chunks = pd.read_sql_query(statement, connection, chunksize=chunksize,
+                               dtype_backend="pyarrow")
+    return pd.concat(chunks, ignore_index=True)
 
 def show_table_columns(engine, table_name):
     """
@@ -79,6 +126,32 @@ def show_table_columns(engine, table_name):
     query = f"SHOW COLUMNS FROM {table_name};"
     return pd.read_sql(query, con=engine)
 
+def create_sales_index(connection):
+    """
+    Create the composite index used by the date-filtered analysis queries
+    
+    The text columns in the sales table can only be indexed by prefix, so
+    the index serves the `Order Date` range scan and narrows the grouping
+    columns rather than covering every selected column.
+    
+    Args:
+        connection (sqlalchemy.engine.Connection): Database connection
+    """
+    index_exists = connection.execute(text("""
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'sales'
+      AND index_name = 'idx_sales_date_region_sub';
+    """)).scalar()
+    if not index_exists:
+        execute_query(connection, """
+        CREATE INDEX idx_sales_date_region_sub
+        ON sales (`Order Date`, Region(32), `Product Sub-Category`(64));
+        """)
+    
+    # Refresh optimizer statistics
+    execute_query(connection, "ANALYZE TABLE sales;")
+
 def main():
     """
     Main function to demonstrate database operations
@@ -87,22 +160,21 @@ def main():
     # Note: Replace with your actual credentials
     engine = create_database_connection('root', 'database123', 'localhost', 'walmart')
     
-    # Create connection
-    connection = connect_to_database(engine)
-    
-    # Example: Update Order Date column to DATE type
-    execute_query(connection, "ALTER TABLE sales MODIFY `Order Date` DATE;")
-    
-    # Show table columns to verify the change
-    columns_df = show_table_columns(engine, 'sales')
-    print(columns_df)
-    
-    # Example: Read data from table
-    sales_df = read_sql_to_dataframe("SELECT * FROM walmart.sales", connection)
-    print(f"Total rows: {len(sales_df)}")
-    
-    # Close connection
-    connection.close()
+    # Borrow a pooled connection; it is returned to the pool on exit
+    with engine.begin() as connection:
+        # Example: Update Order Date column to DATE type
+        execute_query(connection, "ALTER TABLE sales MODIFY `Order Date` DATE;")
+        
+        # Index the columns the analysis queries filter and group on
+        create_sales_index(connection)
+        
+        # Show table columns to verify the change
+        columns_df = show_table_columns(engine, 'sales')
+        print(columns_df)
+        
+        # Example: Count rows in table
+        row_count = execute_query(connection, "SELECT COUNT(*) FROM walmart.sales").scalar()
+        print(f"Total rows: {row_count}")
     
     print("Database operations completed successfully!")
 